@@ -1,7 +1,14 @@
 import os
 import re
 import logging
-from pymongo import MongoClient
+from cachetools import TTLCache
+
+# Optional C extension; without it we fall back to a compiled regex alternation
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+from motor.motor_asyncio import AsyncIOMotorClient
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 from telegram.constants import ParseMode
@@ -17,27 +24,113 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# MongoDB Setup
+# MongoDB Setup (lazy: nothing connects at import time)
 MONGO_URL = os.getenv("MONGO_URL")
-if not MONGO_URL:
-    print("❌ MONGO_URL is missing!")
-    exit(1)
 
-try:
-    client = MongoClient(MONGO_URL)
-    db = client['filter_bot']
-    filters_collection = db['filters']
-    print("✅ Connected to MongoDB")
-except Exception as e:
-    print(f"❌ MongoDB Connection Error: {e}")
-    exit(1)
+_filters_collection = None
+
+# Single shared async client, built on first use inside the running loop
+def get_filters_collection():
+    global _filters_collection
+    if _filters_collection is None:
+        client = AsyncIOMotorClient(
+            MONGO_URL,
+            maxPoolSize=50,
+            serverSelectionTimeoutMS=3000
+        )
+        _filters_collection = client['filter_bot']['filters']
+    return _filters_collection
+
+# Runs once the application's event loop is up
+async def setup_db(app):
+    try:
+        # chat_id-prefixed so both {chat_id, keyword} and {chat_id} lookups use it
+        await get_filters_collection().create_index(
+            [('chat_id', 1), ('keyword', 1)],
+            unique=True,
+            background=True
+        )
+        print("✅ Connected to MongoDB")
+    except Exception as e:
+        print(f"❌ MongoDB Connection Error: {e}")
+        raise
+
+# In-process keyword matchers, keyed by chat_id (None = chat has no filters).
+# TTL bounds memory and lets other workers' edits show up within 5 minutes.
+matcher_cache = TTLCache(maxsize=10_000, ttl=300)
+
+# Compile a matcher: search(text) -> first matching filter doc, or None
+def compile_matcher(docs_by_keyword):
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for keyword, filter_doc in docs_by_keyword.items():
+            automaton.add_word(keyword, filter_doc)
+        automaton.make_automaton()
+
+        def search(text):
+            # The automaton is case-sensitive: fold the haystack once,
+            # amortized across every keyword
+            text = text.lower()
+            for end_index, filter_doc in automaton.iter(text):
+                # Anchored filters only count when the match starts the message
+                if filter_doc.get('prefix_only') and end_index + 1 != len(filter_doc['keyword']):
+                    continue
+                return filter_doc
+            return None
+    else:
+        # One alternation run in _sre's C loop beats N Python-level 'in' checks;
+        # longest keywords first so overlapping keywords prefer the longer match
+        parts = []
+        for keyword in sorted(docs_by_keyword, key=len, reverse=True):
+            escaped = re.escape(keyword)
+            # Anchored filters only count when the match starts the message
+            if docs_by_keyword[keyword].get('prefix_only'):
+                escaped = '^' + escaped
+            parts.append(escaped)
+        # IGNORECASE folds during the scan, so no per-message .lower() copy
+        pattern = re.compile('|'.join(parts), re.IGNORECASE)
+
+        def search(text):
+            match = pattern.search(text)
+            return docs_by_keyword[match.group(0).lower()] if match else None
+
+    return search
+
+# Load a chat's filters and cache (min keyword length, compiled matcher)
+async def load_matcher(chat_id):
+    docs_by_keyword = {}
+    # Project only the fields a reply needs to cut BSON decode work
+    # Pin the compound index and pull the whole chat's filters in one batch
+    cursor = get_filters_collection().find(
+        {'chat_id': chat_id},
+        {'keyword': 1, 'prefix_only': 1, 'text': 1, 'file_id': 1, 'file_type': 1, 'caption': 1, 'buttons': 1}
+    ).hint([('chat_id', 1), ('keyword', 1)]).batch_size(1000)
+    async for filter_doc in cursor:
+        docs_by_keyword[filter_doc['keyword']] = filter_doc
+    if not docs_by_keyword:
+        matcher_cache[chat_id] = None
+        return None
+    state = (min(map(len, docs_by_keyword)), compile_matcher(docs_by_keyword))
+    matcher_cache[chat_id] = state
+    return state
+
+# Media types we know how to resend; maps to bot.send_<type>
+MEDIA_TYPES = ('photo', 'video', 'document', 'animation', 'sticker', 'audio', 'voice')
+
+# [Name](buttonurl:link) markup, compiled once
+BUTTON_PATTERN = re.compile(r'\[([^\]]+)\]\(buttonurl:([^)]+)\)')
 
 # Extract buttons from text
 def extract_buttons(text):
     if not text: return text, []
-    pattern = r'\[([^\]]+)\]\(buttonurl:([^)]+)\)'
-    buttons = re.findall(pattern, text)
-    clean_text = re.sub(pattern, '', text).strip()
+    buttons = []
+
+    def collect(match):
+        buttons.append((match.group(1), match.group(2)))
+        return ''
+
+    # Single pass: strip the markup and collect buttons together
+    clean_text = BUTTON_PATTERN.sub(collect, text).strip()
     return clean_text, buttons
 
 # Build button markup
@@ -53,6 +146,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "👋 Hello! I'm a Global Manual Filter Bot\n\n"
         "Commands:\n"
         "/add_filter <keyword> - Reply to a message to save it as filter\n"
+        "/add_filter ^<keyword> - Same, but only matches at the start of a message\n"
         "/del_filter <keyword> - Delete a filter\n"
         "/filters - Show all saved filters"
     )
@@ -68,13 +162,21 @@ async def add_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     keyword = context.args[0].lower()
+    # A leading ^ anchors the filter to the start of the message
+    prefix_only = keyword.startswith('^')
+    if prefix_only:
+        keyword = keyword[1:]
+    if not keyword:
+        await update.message.reply_text("❌ Usage: /add_filter <keyword>")
+        return
     replied_msg = update.message.reply_to_message
     chat_id = update.effective_chat.id
-    
+
     # Extract content
     filter_data = {
         'chat_id': chat_id,
         'keyword': keyword,
+        'prefix_only': prefix_only,
         'text': None,
         'file_id': None,
         'file_type': None,
@@ -82,10 +184,9 @@ async def add_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'buttons': []
     }
     
-    # Check for additional buttons in command
-    command_text = update.message.text.split(None, 1)[1] if len(update.message.text.split()) > 1 else ""
-    # Remove keyword from command text to get potential button text
-    potential_button_text = command_text.replace(keyword, "", 1).strip()
+    # Check for additional buttons in command: everything after /add_filter <keyword>
+    parts = update.message.text.split(None, 2)
+    potential_button_text = parts[2] if len(parts) > 2 else ""
     _, cmd_buttons = extract_buttons(potential_button_text)
     
     # Handle different message types
@@ -121,13 +222,14 @@ async def add_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
         filter_data['file_id'] = replied_msg.voice.file_id
         filter_data['file_type'] = 'voice'
     
-    # Save to database (replace if exists)
-    filters_collection.replace_one(
+    # Save to database ($set upsert: no full-document rewrite when updating)
+    await get_filters_collection().update_one(
         {'chat_id': chat_id, 'keyword': keyword},
-        filter_data,
+        {'$set': filter_data},
         upsert=True
     )
-    
+    matcher_cache.pop(chat_id, None)
+
     await update.message.reply_text(f"✅ Filter saved for keyword: {keyword}")
 
 # Delete filter
@@ -136,11 +238,13 @@ async def del_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Usage: /del_filter <keyword>")
         return
     
-    keyword = context.args[0].lower()
+    # Accept the ^ prefix here too; filters are stored without it
+    keyword = context.args[0].lower().lstrip('^')
     chat_id = update.effective_chat.id
-    
-    result = filters_collection.delete_one({'chat_id': chat_id, 'keyword': keyword})
-    
+
+    result = await get_filters_collection().delete_one({'chat_id': chat_id, 'keyword': keyword})
+    matcher_cache.pop(chat_id, None)
+
     if result.deleted_count > 0:
         await update.message.reply_text(f"✅ Filter deleted: {keyword}")
     else:
@@ -149,9 +253,12 @@ async def del_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # List all filters
 async def list_filters(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    all_filters = filters_collection.find({'chat_id': chat_id})
-    
-    keywords = [f['keyword'] for f in all_filters]
+    # Covered by the (chat_id, keyword) index: served without touching documents
+    all_filters = get_filters_collection().find(
+        {'chat_id': chat_id}, {'keyword': 1, '_id': 0}
+    ).hint([('chat_id', 1), ('keyword', 1)]).batch_size(1000)
+
+    keywords = [f['keyword'] async for f in all_filters]
     
     if keywords:
         await update.message.reply_text(
@@ -165,67 +272,91 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text:
         return
     
-    text = update.message.text.lower()
+    # Case handling lives in the matcher; keywords are stored lowercased
+    text = update.message.text
     chat_id = update.effective_chat.id
-    
-    # Check all filters
-    # Optimization: In production, use specific query instead of fetching all
-    all_filters = filters_collection.find({'chat_id': chat_id})
-    
-    for filter_doc in all_filters:
-        if filter_doc['keyword'] in text:
-            reply_markup = build_buttons(filter_doc.get('buttons'))
-            
-            try:
-                # Send appropriate content
-                if filter_doc.get('file_type'):
-                    send_method = {
-                        'photo': context.bot.send_photo,
-                        'video': context.bot.send_video,
-                        'document': context.bot.send_document,
-                        'animation': context.bot.send_animation,
-                        'sticker': context.bot.send_sticker,
-                        'audio': context.bot.send_audio,
-                        'voice': context.bot.send_voice
-                    }.get(filter_doc['file_type'])
-                    
-                    if send_method:
-                        kwargs = {
-                            'chat_id': chat_id,
-                            filter_doc['file_type']: filter_doc['file_id'],
-                            'reply_markup': reply_markup,
-                            'reply_to_message_id': update.message.message_id
-                        }
-                        
-                        # Sticker doesn't support caption/parse_mode
-                        if filter_doc['file_type'] != 'sticker':
-                            kwargs['caption'] = filter_doc.get('caption')
-                            kwargs['parse_mode'] = ParseMode.HTML
-                            
-                        await send_method(**kwargs)
-                        
-                elif filter_doc.get('text'):
-                    await update.message.reply_text(
-                        filter_doc['text'],
-                        parse_mode=ParseMode.HTML,
-                        reply_markup=reply_markup,
-                        reply_to_message_id=update.message.message_id
-                    )
-            except Exception as e:
-                print(f"Error sending filter: {e}")
-            break
+
+    # Match all keywords in one pass over the text (no DB call in the hot path)
+    try:
+        state = matcher_cache[chat_id]
+    except KeyError:
+        state = await load_matcher(chat_id)
+
+    if state is None:
+        return
+
+    min_keyword_len, search = state
+    # Too short to contain any keyword: skip the scan entirely
+    if len(text) < min_keyword_len:
+        return
+
+    filter_doc = search(text)
+    if filter_doc is None:
+        return
+
+    reply_markup = build_buttons(filter_doc.get('buttons'))
+
+    try:
+        # Send appropriate content
+        if filter_doc.get('file_type'):
+            file_type = filter_doc['file_type']
+            send_method = (
+                getattr(context.bot, f'send_{file_type}')
+                if file_type in MEDIA_TYPES else None
+            )
+
+            if send_method:
+                kwargs = {
+                    'chat_id': chat_id,
+                    file_type: filter_doc['file_id'],
+                    'reply_markup': reply_markup,
+                    'reply_to_message_id': update.message.message_id
+                }
+
+                # Sticker doesn't support caption/parse_mode
+                if file_type != 'sticker':
+                    kwargs['caption'] = filter_doc.get('caption')
+                    kwargs['parse_mode'] = ParseMode.HTML
+
+                await send_method(**kwargs)
+
+        elif filter_doc.get('text'):
+            await update.message.reply_text(
+                filter_doc['text'],
+                parse_mode=ParseMode.HTML,
+                reply_markup=reply_markup,
+                reply_to_message_id=update.message.message_id
+            )
+    except Exception as e:
+        print(f"Error sending filter: {e}")
 
 # Main function
 def main():
     # Updated to get from ENV directly
     BOT_TOKEN = os.getenv("API_TOKEN")
-    
+
     if not BOT_TOKEN:
         print("❌ Please set API_TOKEN environment variable!")
         return
+
+    if not MONGO_URL:
+        print("❌ MONGO_URL is missing!")
+        return
     
     print("🚀 Bot Starting...")
-    app = Application.builder().token(BOT_TOKEN).build()
+    # Keep-alive pools sized for bursts of filter replies; polling keeps its own connection
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(setup_db)
+        .concurrent_updates(True)
+        .connection_pool_size(256)
+        .pool_timeout(20)
+        .connect_timeout(10)
+        .read_timeout(30)
+        .get_updates_connection_pool_size(1)
+        .build()
+    )
     
     # Add handlers
     app.add_handler(CommandHandler("start", start))